@@ -12,52 +12,160 @@ Características principales:
 - Endpoint /metrics: Métricas de uso (número de predicciones, tiempo de actividad).
 - Endpoint /simulate-error: Simulación de errores para testing.
 
-El modelo utilizado es un clasificador binario entrenado previamente y guardado en 'flight_delay_model.pkl'.
+El modelo utilizado es un clasificador binario (regresión logística) entrenado previamente con train.py,
+cuyos parámetros (coef, intercept) están guardados en 'flight_delay_model.npz'.
 """
 
+import os
+
+# BLAS en un solo hilo: hay que fijarlo ANTES de importar numpy. Con 2 características por vuelo,
+# los hilos de BLAS solo añaden sincronización; con un hilo por worker, uvicorn escala por núcleos.
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("OPENBLAS_NUM_THREADS", "1")
+os.environ.setdefault("MKL_NUM_THREADS", "1")
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
-from pydantic import BaseModel, Field
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
 from typing import List
-import joblib
+import numpy as np
+import orjson
+import threading
 import time
 
 
 
+# Rango válido de distancias: lo comparten la validación y la tabla de probabilidades precalculada.
+DISTANCE_MIN = 100
+DISTANCE_MAX = 5000
+
+
+
 # ------------------------- Modelo de datos Pydantic -------------------------
 # Definimos un modelo Pydantic para validar automáticamente las entradas.
 # Esto permite que FastAPI genere documentación interactiva en /docs con campos editables.
 # Usamos Field para añadir constraints de validación (rangos, etc.).
 class FlightData(BaseModel):
     flight_id: str
-    distance: int = Field(..., ge=100, le=5000, description="Distancia del vuelo en km (100-5000)")
+    distance: int = Field(..., ge=DISTANCE_MIN, le=DISTANCE_MAX, description="Distancia del vuelo en km (100-5000)")
     bad_weather: bool
 
 
+# Adaptador de Pydantic v2 para validar el cuerpo de /predict-batch directamente desde los bytes JSON:
+# validate_json parsea y valida la lista completa en el núcleo compilado de Pydantic (pydantic-core),
+# en una sola pasada y sin construir antes los objetos Python intermedios de json.loads.
+flight_list_adapter = TypeAdapter(List[FlightData])
+
+
 
 # ------------------------- Cargar modelo entrenado -------------------------
 # El modelo de Machine Learning se carga al iniciar la aplicación.
-# Se utiliza joblib para deserializar el modelo guardado en un archivo pickle.
+# El modelo es una regresión logística binaria: la probabilidad de retraso es sigmoid(w · x + b).
+# Por eso no deserializamos el estimador de scikit-learn (pickle con joblib): basta con leer sus
+# parámetros, guardados por train.py en un archivo .npz, y puntuar con NumPy. Así el servidor no
+# importa scikit-learn, arranca mucho más rápido y no depende de su versión.
 # Si no se puede cargar, se lanza un error crítico que detiene la aplicación.
 try:
-    model = joblib.load("flight_delay_model.pkl")
+    with np.load("flight_delay_model.npz") as params:
+        W = params["coef"][0].astype(np.float64)
+        B = float(params["intercept"][0])
     print("Modelo cargado exitosamente.")
 except Exception as e:
     raise RuntimeError(f"No se pudo cargar el modelo: {e}")
 
 
+def _score(X):
+    # X: matriz (N, 2) con [distance, bad_weather]. Devuelve la probabilidad de retraso (N,).
+    z = X @ W + B
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+# Tabla de probabilidades precalculada:
+# Las entradas válidas son pocas (4901 distancias x 2 valores de bad_weather = 9802 combinaciones),
+# así que calculamos la probabilidad de TODAS una sola vez al arrancar. Después, cada predicción es
+# una simple consulta PROB_TABLE[distance - DISTANCE_MIN, bad_weather], sin ningún cálculo.
+# Si se recarga el modelo (W, B), hay que volver a construir la tabla con _build_prob_table().
+def _build_prob_table():
+    distances = np.arange(DISTANCE_MIN, DISTANCE_MAX + 1, dtype=np.float64)
+    X = np.stack([np.repeat(distances, 2), np.tile([0.0, 1.0], distances.size)], axis=1)
+    return _score(X).reshape(distances.size, 2)
+
+
+PROB_TABLE = _build_prob_table()
+
+
+# Buffers de trabajo para /predict-batch:
+# Los lotes se procesan en bloques de BATCH_CHUNK vuelos reutilizando siempre los mismos arrays
+# preasignados (uno por hilo del threadpool, con threading.local). Así un lote de 100.000 vuelos
+# no crea arrays de 100.000 elementos y los datos de cada bloque caben en la caché L2.
+BATCH_CHUNK = 4096
+_tls = threading.local()
+
+
+def _chunk_buffers():
+    buffers = getattr(_tls, "buffers", None)
+    if buffers is None:
+        buffers = (
+            np.empty(BATCH_CHUNK, dtype=np.int32),    # distance -> índice en la tabla
+            np.empty(BATCH_CHUNK, dtype=np.uint8),    # bad_weather
+            np.empty(BATCH_CHUNK, dtype=np.float64),  # probabilidades
+            np.empty(BATCH_CHUNK, dtype=bool),        # delayed
+        )
+        _tls.buffers = buffers
+    return buffers
+
+
+
+# ------------------------- Calentamiento al arrancar -------------------------
+# La primera petición pagaría la inicialización perezosa de la validación de Pydantic, de las
+# operaciones de NumPy y de la serialización con orjson, provocando un pico de latencia.
+# Al arrancar cada worker pasamos un lote ficticio por la validación y por el mismo generador que
+# usa /predict-batch (_stream_batch), sin tocar las métricas. Los buffers de _chunk_buffers son
+# por hilo, así que cada hilo del threadpool los crea igualmente en su primer lote.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    sample = _validate_batch(
+        b'[{"flight_id": "WARMUP", "distance": 500, "bad_weather": false},'
+        b' {"flight_id": "WARMUP", "distance": 2000, "bad_weather": true}]'
+    )
+    b"".join(_stream_batch(sample, record_metrics=False))
+    yield
+
+
 
 # ------------------------- Inicializar FastAPI -------------------------
 # Se crea una instancia de FastAPI con un título descriptivo.
 # FastAPI es un framework moderno para construir APIs web con Python, basado en estándares como OpenAPI.
-app = FastAPI(title="Flight Delay ML API - Didáctica Avanzada")
+# ORJSONResponse como respuesta por defecto: serializa con orjson, mucho más rápido que el json
+# estándar, algo que se nota en /predict-batch con miles de predicciones.
+# lifespan ejecuta el calentamiento (ver arriba) antes de empezar a atender peticiones.
+app = FastAPI(
+    title="Flight Delay ML API - Didáctica Avanzada",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
 
 # Contadores y estado simple para métricas
 # prediction_count: Número total de predicciones realizadas desde el inicio.
 # start_time: Momento en que se inició la aplicación, para calcular el uptime.
+# prediction_lock: los endpoints de predicción se ejecutan en el threadpool de FastAPI,
+# así que varias peticiones pueden actualizar el contador a la vez; el lock evita perder incrementos.
 prediction_count = 0
+prediction_lock = threading.Lock()
 start_time = time.time()
 
 
+def _record_predictions(n):
+    # Suma n predicciones al contador global con un único read-modify-write protegido por el lock.
+    # Los endpoints lo llaman una sola vez por petición (también en lotes), nunca por fila.
+    global prediction_count
+    with prediction_lock:
+        prediction_count += n
+
+
 
 # ------------------------- Endpoint predict -------------------------
 # Endpoint POST para hacer una predicción individual de retraso en un vuelo.
@@ -69,7 +177,7 @@ start_time = time.time()
 # Proceso:
 # 1. Pydantic valida automáticamente los datos según el modelo FlightData.
 # 2. Prepara las características para el modelo: [distance, bad_weather (como int)].
-# 3. Usa el modelo para predecir la probabilidad de retraso.
+# 3. Consulta la probabilidad de retraso en la tabla precalculada al arrancar (PROB_TABLE).
 # 4. Determina si el vuelo se considera retrasado (probabilidad > 0.5).
 # 5. Incrementa el contador de predicciones.
 # 6. Retorna un JSON con flight_id, delay_probability y delayed.
@@ -84,31 +192,36 @@ start_time = time.time()
 # Errores posibles:
 # - 422: Datos inválidos (Pydantic validation error).
 # - 500: Error interno (problema con el modelo o procesamiento).
+#
+# Notas:
+# - No agrupamos peticiones concurrentes en micro-lotes (dynamic batching, como Triton o TF-Serving).
+#   Esa técnica amortiza el coste fijo de cada llamada al modelo, pero aquí cada predicción es una
+#   única lectura de PROB_TABLE: esperar unos milisegundos a juntar un lote solo añadiría latencia.
+#   Si el modelo se cambiara por uno costoso de evaluar, sí merecería la pena.
 @app.post("/predict")
 # Decorador que registra un endpoint HTTP POST en FastAPI, asigna la ruta y el método,
 # y además lo incluye en el esquema OpenAPI para que aparezca en /docs automáticamente.
-# async declara una función asíncrona compatible con el event loop: si hubiera operaciones
-# de I/O (red, disco), se podrían hacer sin bloquear otras peticiones concurrentes.
-async def predict_delay(data: FlightData):
-    # Usamos un contador global para acumular métricas simples entre peticiones.
-    # Es un estado compartido a nivel de proceso: se reinicia al reiniciar la app
+# Se declara con def (no async def) porque el cálculo es CPU puro y bloqueante: FastAPI
+# ejecuta las funciones def en un threadpool, así no se bloquea el event loop de uvicorn
+# y otras peticiones concurrentes pueden seguir atendiéndose.
+def predict_delay(data: FlightData):
+    # Usamos un contador global (vía _record_predictions) para acumular métricas simples entre
+    # peticiones. Es un estado compartido a nivel de proceso: se reinicia al reiniciar la app
     # y no es compartido entre múltiples workers si se ejecutan varios procesos.
-    global prediction_count
     try:
         # Pydantic ya validó automáticamente los tipos y constraints
         flight_id = data.flight_id
         distance = data.distance
         bad_weather = data.bad_weather
 
-        # Preparar características para el modelo: lista de listas con distance y bad_weather convertido a int
-        features = [[distance, int(bad_weather)]]
-        # Predecir la probabilidad usando predict_proba (probabilidad de clase positiva, retraso)
-        probability = float(model.predict_proba(features)[0][1])
+        # Consultar la probabilidad de retraso (clase positiva) en la tabla precalculada,
+        # usando bad_weather como int para indexar la columna
+        probability = float(PROB_TABLE[distance - DISTANCE_MIN, int(bad_weather)])
         # Determinar si se considera retrasado basado en umbral 0.5
         delayed = probability > 0.5
 
         # Incrementar contador global de predicciones
-        prediction_count += 1
+        _record_predictions(1)
 
         # Retornar respuesta con resultados
         return {
@@ -131,14 +244,19 @@ async def predict_delay(data: FlightData):
 # Cuerpo de la solicitud: Lista de JSON, cada uno con flight_id, distance, bad_weather.
 #
 # Proceso:
-# 1. Recibe una lista de datos JSON.
-# 2. Verifica que sea una lista.
-# 3. Para cada vuelo en la lista:
-#    a. Valida los datos (si falla, ignora ese vuelo).
-#    b. Prepara características y predice.
-#    c. Agrega resultado a la lista.
-#    d. Incrementa contador.
-# 4. Retorna JSON con lista de predicciones y conteo total.
+# 1. Lee el cuerpo crudo y lo valida con flight_list_adapter.validate_json (sin doble parseo).
+# 2. Recorre el lote en bloques de BATCH_CHUNK vuelos. Para cada bloque:
+#    a. Copia distance y bad_weather en dos arrays NumPy contiguos preasignados (uno por campo,
+#       "Struct of Arrays").
+#    b. Obtiene las probabilidades del bloque con UNA sola consulta indexada a PROB_TABLE,
+#       sin ningún cálculo por vuelo.
+#    c. Serializa los resultados del bloque con orjson y los envía al cliente (StreamingResponse).
+#    d. Actualiza el contador una sola vez por bloque.
+# 3. Cierra el JSON con el conteo total.
+#
+# La respuesta se envía en streaming: nunca se construye en memoria la lista completa de
+# resultados, así que la memoria usada no crece con el tamaño del lote y el cliente empieza a
+# recibir datos en cuanto está listo el primer bloque.
 #
 # Respuesta exitosa (200):
 # {
@@ -150,38 +268,98 @@ async def predict_delay(data: FlightData):
 # }
 #
 # Notas:
-# - Vuelos inválidos se ignoran silenciosamente (no se incluyen en resultados).
+# - Si algún vuelo es inválido se rechaza el lote completo con un 422, igual que en /predict.
+#   La validación termina antes de empezar a enviar la respuesta.
 # - Útil para procesar múltiples vuelos en una sola solicitud, optimizando rendimiento.
-@app.post("/predict-batch")
+# - Como el endpoint recibe el Request crudo, el esquema del cuerpo se declara en openapi_extra
+#   para que /docs siga mostrando la lista de FlightData editable.
+@app.post(
+    "/predict-batch",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"type": "array", "items": FlightData.model_json_schema()}
+                }
+            },
+        }
+    },
+)
 # Decorador POST: vincula esta función a la ruta /predict-batch como endpoint de la API.
-# async permite manejar muchas solicitudes concurrentes sin bloquear el servidor.
-async def predict_batch(data_list: List[FlightData]):
-    # Contador global reutilizado para sumar todas las predicciones del lote.
-    global prediction_count
+# async solo para leer el cuerpo sin bloquear; la validación (CPU puro) se ejecuta en el threadpool
+# con run_in_threadpool, y StreamingResponse también recorre el generador síncrono en el threadpool.
+async def predict_batch(request: Request):
+    raw = await request.body()
+    data_list = await run_in_threadpool(_validate_batch, raw)
+    # Una vez empezado el streaming ya se enviaron el código 200 y las cabeceras: un error a mitad
+    # del lote no puede convertirse en un 500 y simplemente corta la conexión.
+    return StreamingResponse(_stream_batch(data_list), media_type="application/json")
+
+
+# Validación del cuerpo crudo, ejecutada en el threadpool.
+def _validate_batch(raw: bytes):
     try:
-        results = []
-        for data in data_list:
-            # Pydantic ya validó automáticamente
-            flight_id = data.flight_id
-            distance = data.distance
-            bad_weather = data.bad_weather
-            features = [[distance, int(bad_weather)]]
-            probability = float(model.predict_proba(features)[0][1])
-            delayed = probability > 0.5
-            # Agregar resultado a la lista
-            results.append({
-                "flight_id": flight_id,
+        return flight_list_adapter.validate_json(raw)
+    except ValidationError as e:
+        # Mismo formato de error 422 que FastAPI genera al validar el cuerpo automáticamente.
+        # En un JSON mal formado (json_invalid) el "input" sería el cuerpo crudo entero (bytes, quizá
+        # no UTF-8), que no se puede serializar y reenviaría megabytes al cliente: como FastAPI,
+        # lo sustituimos por {}.
+        errors = []
+        for err in e.errors(include_url=False):
+            err["loc"] = ("body", *err["loc"])
+            if err["type"] == "json_invalid":
+                err["input"] = {}
+            errors.append(err)
+        raise RequestValidationError(errors)
+
+
+# Generador que produce el JSON de respuesta bloque a bloque.
+# Cada paso del generador puede ejecutarse en un hilo distinto del threadpool, así que los buffers
+# del hilo se piden en cada bloque y se terminan de usar (tolist) antes del yield.
+def _stream_batch(data_list, record_metrics=True):
+    # Vista plana de la tabla: la fila (distance, bad_weather) está en 2 * (distance - DISTANCE_MIN) + bad_weather
+    flat_table = PROB_TABLE.reshape(-1)
+
+    yield b'{"predictions":['
+    for start in range(0, len(data_list), BATCH_CHUNK):
+        chunk = data_list[start:start + BATCH_CHUNK]
+        m = len(chunk)
+        dist_buf, bw_buf, prob_buf, delayed_buf = _chunk_buffers()
+        # Un array contiguo por campo en lugar de una lista de listas [[distance, bad_weather], ...]
+        idx, bw, probabilities, delayed = dist_buf[:m], bw_buf[:m], prob_buf[:m], delayed_buf[:m]
+        for i, data in enumerate(chunk):
+            idx[i] = data.distance
+            bw[i] = data.bad_weather
+
+        # Índice en la tabla y consulta, todo escrito sobre los buffers sin crear arrays nuevos
+        np.subtract(idx, DISTANCE_MIN, out=idx)
+        np.multiply(idx, 2, out=idx)
+        np.add(idx, bw, out=idx)
+        np.take(flat_table, idx, out=probabilities)
+        np.greater(probabilities, 0.5, out=delayed)
+
+        # tolist() convierte el bloque entero a float/bool nativos de Python en un solo bucle en C,
+        # en lugar de un float()/bool() por fila (y evita que lleguen tipos NumPy al JSON)
+        results = [
+            {
+                "flight_id": data.flight_id,
                 "delay_probability": probability,
-                "delayed": delayed
-            })
-            # Incrementar contador por cada predicción exitosa
-            prediction_count += 1
+                "delayed": is_delayed
+            }
+            for data, probability, is_delayed in zip(chunk, probabilities.tolist(), delayed.tolist())
+        ]
+        # Incrementar contador con las predicciones del bloque (no en el calentamiento)
+        if record_metrics:
+            _record_predictions(m)
 
-        # Retornar resultados y conteo
-        return {"predictions": results, "count": len(results)}
+        # orjson serializa el bloque como "[...]"; quitamos los corchetes y separamos bloques con comas
+        body = orjson.dumps(results)[1:-1]
+        yield body if start == 0 else b"," + body
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {e}")
+    # Cerrar el JSON con el conteo total
+    yield b'],"count":%d}' % len(data_list)
 
 
 
@@ -226,6 +404,10 @@ def info():
 #
 # Útil para monitoreo y debugging del servicio.
 #
+# Nota: con varios workers (ver el arranque al final del archivo) cada proceso tiene su propio
+# contador y su propio start_time, así que /metrics devuelve los valores del worker que atiende
+# la petición. Para un total global habría que llevar el contador a un almacén compartido (p. ej. Redis).
+#
 # Respuesta (200):
 # {
 #   "total_predictions": 42,
@@ -235,8 +417,11 @@ def info():
 def metrics():
     # Calcular uptime restando el tiempo actual al tiempo de inicio
     uptime = int(time.time() - start_time)
+    # Leer el contador bajo el mismo lock que lo actualiza
+    with prediction_lock:
+        total_predictions = prediction_count
     return {
-        "total_predictions": prediction_count,
+        "total_predictions": total_predictions,
         "uptime_seconds": uptime
     }
 
@@ -273,3 +458,14 @@ async def simulate_error(data: ErrorData):
         raise HTTPException(status_code=418, detail="Este es un error simulado para enseñar manejo")
     # Retornar éxito si no se solicita error
     return {"status": "ok", "message": "No se produjo error"}
+
+
+# ------------------------- Arranque del servidor -------------------------
+# Ejecutando `python app.py` se lanza uvicorn: un solo worker, o WEB_CONCURRENCY workers si está definida.
+# uvicorn usa uvloop y httptools automáticamente si están instalados (incluidos en uvicorn[standard]).
+# El comando recomendado para producción (un worker por núcleo) está en Notebook_guia.ipynb.
+if __name__ == "__main__":
+    import uvicorn
+
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    uvicorn.run("app:app", host="0.0.0.0", port=8000, workers=workers)
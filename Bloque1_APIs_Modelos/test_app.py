@@ -0,0 +1,34 @@
+import importlib
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # La app carga flight_delay_model.npz del directorio actual al importarse
+    np.savez(tmp_path / "flight_delay_model.npz", coef=np.array([[0.0007, 2.0]]), intercept=np.array([-2.0]))
+    monkeypatch.chdir(tmp_path)
+    import app
+    importlib.reload(app)
+    with TestClient(app.app) as client:
+        yield client
+
+
+@pytest.mark.parametrize("body", [b"\xff\xfe", b'[{"flight_id": "A", "distance": 500,'])
+def test_predict_batch_invalid_json_returns_422(client, body):
+    response = client.post("/predict-batch", content=body, headers={"Content-Type": "application/json"})
+    assert response.status_code == 422
+    detail = response.json()["detail"]
+    assert detail[0]["type"] == "json_invalid"
+    assert detail[0]["loc"][0] == "body"
+    assert detail[0]["input"] == {}
+
+
+def test_predict_batch_invalid_flight_returns_422(client):
+    response = client.post("/predict-batch", json=[{"flight_id": "A", "distance": 50, "bad_weather": False}])
+    assert response.status_code == 422
+    detail = response.json()["detail"]
+    assert detail[0]["loc"] == ["body", 0, "distance"]
+    assert detail[0]["input"] == 50
@@ -3,26 +3,17 @@ import numpy as np
 import joblib
 from sklearn.linear_model import LogisticRegression
 
-# Generar datos sintéticos
-np.random.seed(0)
-X = []
-y = []
+# Generar datos sintéticos (vectorizado: todas las muestras de una vez, sin bucle Python)
+N = 300
+rng = np.random.default_rng(0)
+distance = rng.integers(200, 3000, size=N)
+bad_weather = rng.integers(0, 2, size=N)
 
-for _ in range(300):
-    distance = np.random.randint(200, 3000)
-    bad_weather = np.random.choice([0, 1])
+# Probabilidad de retraso
+delay_prob = 0.2 + 0.3 * (distance > 1500) + 0.4 * (bad_weather == 1)
 
-    # Probabilidad de retraso
-    delay_prob = 0.2
-    if distance > 1500:
-        delay_prob += 0.3
-    if bad_weather == 1:
-        delay_prob += 0.4
-
-    delayed = np.random.rand() < delay_prob
-
-    X.append([distance, bad_weather])
-    y.append(int(delayed))
+y = (rng.random(N) < delay_prob).astype(np.int8)
+X = np.column_stack([distance, bad_weather])
 
 # Entrenar modelo
 model = LogisticRegression()
@@ -30,4 +21,8 @@ model.fit(X, y)
 
 # Guardar modelo para la API
 joblib.dump(model, "model.pkl")
-print("Modelo guardado en model.pkl")
\ No newline at end of file
+print("Modelo guardado en model.pkl")
+
+# Guardar solo los parámetros (coef, intercept) para la API: no necesita scikit-learn para cargarlos
+np.savez("flight_delay_model.npz", coef=model.coef_, intercept=model.intercept_)
+print("Parámetros guardados en flight_delay_model.npz")
@@ -14,12 +14,22 @@ model = joblib.load('model.pkl')
 # with open('scaler.pkl', 'rb') as f:
 #     scaler = pickle.load(f)
 
+def to_features(values, single=False):
+    # Convierte los datos del request en la matriz 2D de float64 que espera el modelo.
+    # Con single=True, 'features' es un solo vector y se convierte en una fila (1, n).
+    features = np.asarray(values, dtype=np.float64)
+    if single:
+        features = features.reshape(1, -1)
+    if features.ndim != 2:
+        raise ValueError("'features' debe ser una lista de listas")
+    return features
+
 @app.route('/')
 def home():
     return jsonify({
         'message': 'API de Machine Learning',
         'version': '1.0',
-        'endpoints': ['/predict']
+        'endpoints': ['/predict', '/predict-batch']
     })
 
 @app.route('/predict', methods=['POST'])
@@ -27,7 +37,7 @@ def predict():
     try:
         # Obtener datos del request
         data = request.get_json()
-        features = np.array(data['features']).reshape(1, -1)
+        features = to_features(data['features'], single=True)
         
         # Realizar predicción
         prediction = model.predict(features)
@@ -43,11 +53,35 @@ def predict():
             'status': 'error'
         }), 400
 
+@app.route('/predict-batch', methods=['POST'])
+def predict_batch():
+    try:
+        # Obtener datos del request: una lista de vectores de características
+        data = request.get_json()
+        features = to_features(data['features'])
+
+        # Una sola llamada al modelo para todo el lote
+        predictions = model.predict(features)
+
+        return jsonify({
+            'predictions': predictions.tolist(),
+            'count': len(predictions),
+            'status': 'success'
+        })
+
+    except Exception as e:
+        return jsonify({
+            'error': str(e),
+            'status': 'error'
+        }), 400
+
 @app.route('/health')
 def health():
     return jsonify({'status': 'healthy'})
 
 if __name__ == '__main__':
+    # Solo para desarrollo local: app.run usa el servidor de desarrollo de Werkzeug.
+    # En producción se arranca con gunicorn (ver gunicorn.conf.py): gunicorn app:app
     # Render asigna el puerto dinámicamente
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port)
\ No newline at end of file
@@ -0,0 +1,17 @@
+# gunicorn.conf.py - Configuración de gunicorn para producción
+
+# gunicorn lee este archivo automáticamente al arrancar desde esta carpeta,
+# así que el Start Command de Render sigue siendo simplemente: gunicorn app:app
+import os
+
+# Render asigna el puerto dinámicamente
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Número de procesos: 2 por defecto, como en la guía de Render (o WEB_CONCURRENCY).
+# No usamos cpu_count(): dentro de un contenedor devuelve los núcleos del host, no los de la
+# instancia, y cada worker carga su propia copia de scikit-learn y del modelo en memoria.
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+
+# Workers con hilos: cada proceso atiende varias peticiones a la vez mientras otras esperan I/O
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))